@@ -7,163 +7,341 @@
     python analyze_logs.py /path/to/logfile.log
     或者直接传入最近的日志：
     tail -n 10000 /var/log/dashboard.log | python analyze_logs.py -
+    指定标签扫描器（默认 re，实测最快）：
+    python analyze_logs.py --scanner ahocorasick /path/to/logfile.log
+
+可选依赖：
+    pyahocorasick - --scanner ahocorasick 使用 Aho-Corasick 自动机扫描标签
+    hyperscan     - --scanner hyperscan 使用 Hyperscan 多模式数据库扫描标签
+    numpy         - 安装后报告中的统计改为向量化计算
 """
 
 import sys
 import re
+import argparse
+import heapq
+from array import array
 from datetime import datetime
-from collections import defaultdict
+from collections import defaultdict, Counter
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+READ_CHUNK_SIZE = 65536
+
+_TAGS = ('HTTP_START', 'HTTP_END', 'REQ_START', 'REQ_END', 'REQ_SLOW', 'REQ_TIMEOUT')
+
+# 标签定位、按标签分支和字段提取合并成一个正则，由 SRE 在 C 层一次完成；
+# 各分支共享 '[' 前缀，用 lastindex（所命中分支最后一个分组的编号）区分标签
+_RE_RECORD = re.compile(
+    r'\[(?:'
+    r'REQ_START\] id=(\d+) method=\S+ url=(\S+) caller=\S+ thread=\S+ active_count=(\d+)'  # 1-3
+    r'|REQ_END\] id=(\d+) elapsed=([\d.]+)s'                                                  # 4-5
+    r'|HTTP_START\] request_id=(\S+) method=(\S+) path=(\S+)'                                 # 6-8
+    r'|HTTP_END\] request_id=(\S+) method=\S+ path=\S+ status=(\S+) elapsed=([\d.]+)s'       # 9-11
+    r'|REQ_SLOW\] id=(\d+) method=\S+ url=\S+ elapsed=([\d.]+)s caller=(\S+)'                # 12-14
+    r'|REQ_TIMEOUT\] id=(\d+) method=\S+ url=(\S+) elapsed=([\d.]+)s'                         # 15-17
+    r')'
+)
+_REQ_START, _REQ_END, _HTTP_START, _HTTP_END, _REQ_SLOW, _REQ_TIMEOUT = 3, 5, 8, 11, 14, 17
+
+
+def _match_records(text, starts):
+    """在给定的标签起始偏移处提取字段"""
+    match = _RE_RECORD.match
+    for start in starts:
+        record = match(text, start)
+        if record:
+            yield record
+
+
+def _build_ahocorasick_scanner():
+    """用 Aho-Corasick 自动机一次扫描所有标签（需要 pyahocorasick）"""
+    if ahocorasick is None:
+        raise ValueError("scanner 'ahocorasick' requires pyahocorasick")
+
+    automaton = ahocorasick.Automaton()
+    for tag in _TAGS:
+        keyword = '[%s] ' % tag
+        automaton.add_word(keyword, len(keyword))
+    automaton.make_automaton()
+
+    def scan_records(text):
+        # iter() 返回的是关键字最后一个字符的偏移
+        return _match_records(text, (end - length + 1 for end, length in automaton.iter(text)))
+
+    return scan_records
+
+
+def _build_hyperscan_scanner():
+    """用 Hyperscan 编译的多模式数据库扫描标签（需要 hyperscan）"""
+    if hyperscan is None:
+        raise ValueError("scanner 'hyperscan' requires hyperscan")
+
+    keywords = [('[%s] ' % tag).encode('ascii') for tag in _TAGS]
+    database = hyperscan.Database()
+    database.compile(
+        expressions=[re.escape(keyword) for keyword in keywords],
+        ids=list(range(len(keywords))),
+        elements=len(keywords),
+        flags=[0] * len(keywords),
+    )
+
+    def tag_starts(text):
+        data = text.encode('utf-8')
+        hits = []
+
+        def on_match(tag_id, start, end, flags, context):
+            hits.append((end, tag_id))
+
+        database.scan(data, match_event_handler=on_match)
+        hits.sort()
+
+        if len(data) == len(text):
+            # 纯 ASCII，字节偏移就是字符偏移
+            for end, tag_id in hits:
+                yield end - len(keywords[tag_id])
+            return
+
+        # 含多字节字符时，把字节偏移增量换算成字符偏移；标签以 ASCII 结尾，切片不会截断字符
+        byte_pos = char_pos = 0
+        for end, tag_id in hits:
+            char_pos += len(data[byte_pos:end].decode('utf-8'))
+            byte_pos = end
+            yield char_pos - len(keywords[tag_id])
+
+    def scan_records(text):
+        return _match_records(text, tag_starts(text))
+
+    return scan_records
+
+
+# 扫描器：返回一块文本中所有记录的 _RE_RECORD 匹配对象。
+# re 直接用 finditer，利用 SRE 的字面量前缀快速路径，实测比 Aho-Corasick / Hyperscan 更快，作为默认值
+SCANNERS = {
+    're': lambda: _RE_RECORD.finditer,
+    'ahocorasick': _build_ahocorasick_scanner,
+    'hyperscan': _build_hyperscan_scanner,
+}
+
+
+def _stats(values):
+    """返回 array.array 的 (平均值, 最大值, 最小值)；有 numpy 时直接在原缓冲区上做归约"""
+    if np is not None:
+        arr = np.frombuffer(values, dtype=values.typecode)
+        return float(arr.mean()), arr.max().item(), arr.min().item()
+    return sum(values) / len(values), max(values), min(values)
+
+
+def _top_indices(values, k):
+    """按值从大到小返回前 k 个下标，值相同时下标小的在前（与稳定排序一致）"""
+    n = len(values)
+    if np is None or n <= k:
+        return heapq.nlargest(k, range(n), key=values.__getitem__)
+
+    arr = np.frombuffer(values, dtype=values.typecode)
+    # 第 k 大的值作为阈值：严格大于阈值的全部入选，等于阈值的按下标顺序补足 k 个
+    threshold = np.partition(arr, n - k)[n - k]
+    above = np.flatnonzero(arr > threshold)
+    ties = np.flatnonzero(arr == threshold)[:k - len(above)]
+    idx = np.concatenate((above, ties))
+    return idx[np.lexsort((idx, -arr[idx]))].tolist()
+
+
+def _distribution(values):
+    """统计非负整数 array.array 的取值分布，返回按取值排序的 [(值, 次数)]"""
+    if np is not None:
+        counts = np.bincount(np.frombuffer(values, dtype=values.typecode))
+        present = np.flatnonzero(counts)
+        return list(zip(present.tolist(), counts[present].tolist()))
+    return sorted(Counter(values).items())
+
 
 class LogAnalyzer:
-    def __init__(self):
-        self.http_requests = {}  # request_id -> {start, end, elapsed, method, path}
-        self.api_requests = {}   # id -> {start, end, elapsed, method, url, caller}
+    def __init__(self, scanner='re'):
+        # 请求记录按列存放（SoA），避免每个请求一个小 dict
+        # HTTP 请求：进行中的请求只保留开始信息，结束后写入各列
+        self.http_started = 0
+        self.http_starts = {}                   # request_id -> (start, method, path)
+        self.http_ended_elapsed = array('d')
+        self.http_ended_method = []
+        self.http_ended_path = []
+        self.http_ended_status = []
+        # API 调用
+        self.api_started = 0
+        self.api_urls = {}                      # id -> url
+        self.api_start_active = array('l')      # 每次调用开始时的并发数
+        self.api_ended_elapsed = array('d')
+        self.api_ended_url = []
         self.slow_requests = []
         self.timeouts = []
         self.errors = []
         self.concurrent_peak = 0
+        self._last_timestamp_str = None
+        self._last_timestamp = None
+        self._scan_records = SCANNERS[scanner]()
         
     def parse_line(self, line):
         """解析日志行"""
-        # 提取时间戳
-        timestamp_match = re.match(r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})', line)
-        if not timestamp_match:
-            return None
-        
-        timestamp_str = timestamp_match.group(1)
-        try:
-            timestamp = datetime.strptime(timestamp_str, '%Y-%m-%d %H:%M:%S')
-        except:
-            return None
+        # 时间戳固定是行首 19 个字符：YYYY-mm-dd HH:MM:SS
+        timestamp_str = line[:19]
+        if timestamp_str != self._last_timestamp_str:
+            if (len(timestamp_str) != 19 or timestamp_str[4] != '-' or timestamp_str[7] != '-'
+                    or timestamp_str[10] != ' ' or timestamp_str[13] != ':' or timestamp_str[16] != ':'):
+                return None
+            try:
+                timestamp = datetime(
+                    int(timestamp_str[0:4]), int(timestamp_str[5:7]), int(timestamp_str[8:10]),
+                    int(timestamp_str[11:13]), int(timestamp_str[14:16]), int(timestamp_str[17:19])
+                )
+            except ValueError:
+                return None
+            # 相邻日志行大多落在同一秒，缓存上一次的解析结果
+            self._last_timestamp_str = timestamp_str
+            self._last_timestamp = timestamp
         
         return {
-            'timestamp': timestamp,
+            'timestamp': self._last_timestamp,
             'line': line
         }
     
-    def analyze_http_start(self, match, timestamp):
-        """分析 HTTP 请求开始"""
-        request_id = match.group(1)
-        method = match.group(2)
-        path = match.group(3)
-        
-        self.http_requests[request_id] = {
-            'start': timestamp,
-            'method': method,
-            'path': path
-        }
-    
-    def analyze_http_end(self, match, timestamp):
-        """分析 HTTP 请求结束"""
-        request_id = match.group(1)
-        status = match.group(4)
-        elapsed = float(match.group(5))
-        
-        if request_id in self.http_requests:
-            self.http_requests[request_id]['end'] = timestamp
-            self.http_requests[request_id]['status'] = status
-            self.http_requests[request_id]['elapsed'] = elapsed
-    
-    def analyze_req_start(self, match, timestamp):
-        """分析 API 请求开始"""
-        req_id = match.group(1)
-        method = match.group(2)
-        url = match.group(3)
-        caller = match.group(4)
-        active_count = int(match.group(6))
-        
-        self.api_requests[req_id] = {
-            'start': timestamp,
-            'method': method,
-            'url': url,
-            'caller': caller,
-            'active_count_start': active_count
-        }
-        
-        # 更新并发峰值
-        if active_count > self.concurrent_peak:
-            self.concurrent_peak = active_count
-    
-    def analyze_req_end(self, match, timestamp):
-        """分析 API 请求结束"""
-        req_id = match.group(1)
-        elapsed = float(match.group(2))
-        
-        if req_id in self.api_requests:
-            self.api_requests[req_id]['end'] = timestamp
-            self.api_requests[req_id]['elapsed'] = elapsed
-    
-    def analyze_slow(self, match, timestamp):
-        """分析慢请求"""
-        req_id = match.group(1)
-        elapsed = float(match.group(4))
-        caller = match.group(5)
-        
-        self.slow_requests.append({
-            'req_id': req_id,
-            'timestamp': timestamp,
-            'elapsed': elapsed,
-            'caller': caller
-        })
-    
-    def analyze_timeout(self, match, timestamp):
-        """分析超时"""
-        req_id = match.group(1)
-        url = match.group(3)
-        elapsed = float(match.group(4))
-        
-        self.timeouts.append({
-            'req_id': req_id,
-            'timestamp': timestamp,
-            'url': url,
-            'elapsed': elapsed
-        })
-    
-    def analyze_file(self, file_handle):
-        """分析日志文件"""
-        for line in file_handle:
-            parsed = self.parse_line(line)
-            if not parsed:
-                continue
-            
-            timestamp = parsed['timestamp']
-            line = parsed['line']
-            
-            # HTTP 请求开始
-            match = re.search(r'\[HTTP_START\] request_id=(\S+) method=(\S+) path=(\S+)', line)
-            if match:
-                self.analyze_http_start(match, timestamp)
-                continue
-            
-            # HTTP 请求结束
-            match = re.search(r'\[HTTP_END\] request_id=(\S+) method=(\S+) path=(\S+) status=(\S+) elapsed=([\d.]+)s', line)
-            if match:
-                self.analyze_http_end(match, timestamp)
-                continue
-            
-            # API 请求开始
-            match = re.search(r'\[REQ_START\] id=(\d+) method=(\S+) url=(\S+) caller=(\S+) thread=(\S+) active_count=(\d+)', line)
-            if match:
-                self.analyze_req_start(match, timestamp)
-                continue
-            
-            # API 请求结束
-            match = re.search(r'\[REQ_END\] id=(\d+) elapsed=([\d.]+)s', line)
-            if match:
-                self.analyze_req_end(match, timestamp)
-                continue
-            
-            # 慢请求
-            match = re.search(r'\[REQ_SLOW\] id=(\d+) method=(\S+) url=(\S+) elapsed=([\d.]+)s caller=(\S+)', line)
-            if match:
-                self.analyze_slow(match, timestamp)
+    def _process_block(self, text):
+        """分析一个已解码、由完整行组成的日志块"""
+        # 热循环中把属性和方法绑定为局部变量，并内联各标签的处理逻辑，
+        # 避免逐行的属性查找和函数调用开销
+        scan_records = self._scan_records
+        text_rfind = text.rfind
+        parse_line = self.parse_line
+        # 方法、路径、URL、调用点取值集合很小，驻留后重复值共享同一个对象
+        intern = sys.intern
+        http_starts = self.http_starts
+        http_ended_elapsed_append = self.http_ended_elapsed.append
+        http_ended_method_append = self.http_ended_method.append
+        http_ended_path_append = self.http_ended_path.append
+        http_ended_status_append = self.http_ended_status.append
+        http_started = self.http_started
+        api_urls = self.api_urls
+        api_start_active_append = self.api_start_active.append
+        api_ended_elapsed_append = self.api_ended_elapsed.append
+        api_ended_url_append = self.api_ended_url.append
+        api_started = self.api_started
+        slow_requests_append = self.slow_requests.append
+        timeouts_append = self.timeouts.append
+        concurrent_peak = self.concurrent_peak
+        last_line_start = -1
+        last_timestamp_str = None
+        timestamp = None
+
+        # 直接在整块文本上扫描记录，不再逐行切分；字段正则都不会跨越换行
+        for record in scan_records(text):
+            line_start = text_rfind('\n', 0, record.start()) + 1
+            if line_start == last_line_start:
+                # 每行只处理第一个标签
                 continue
-            
-            # 超时
-            match = re.search(r'\[REQ_TIMEOUT\] id=(\d+) method=(\S+) url=(\S+) elapsed=([\d.]+)s', line)
-            if match:
-                self.analyze_timeout(match, timestamp)
+            last_line_start = line_start
+
+            timestamp_str = text[line_start:line_start + 19]
+            if timestamp_str != last_timestamp_str:
+                parsed = parse_line(timestamp_str)
+                if not parsed:
+                    continue
+                timestamp = parsed['timestamp']
+                last_timestamp_str = timestamp_str
+
+            kind = record.lastindex
+            if kind == _REQ_START:
+                # API 请求开始
+                req_id, url, active_count = record.group(1, 2, 3)
+                active_count = int(active_count)
+                api_started += 1
+                api_urls[req_id] = intern(url)
+                api_start_active_append(active_count)
+                # 更新并发峰值
+                if active_count > concurrent_peak:
+                    concurrent_peak = active_count
+
+            elif kind == _REQ_END:
+                # API 请求结束
+                req_id, elapsed = record.group(4, 5)
+                url = api_urls.get(req_id)
+                if url is not None:
+                    api_ended_elapsed_append(float(elapsed))
+                    api_ended_url_append(url)
+
+            elif kind == _HTTP_START:
+                # HTTP 请求开始
+                request_id, method, path = record.group(6, 7, 8)
+                http_started += 1
+                http_starts[request_id] = (timestamp, intern(method), intern(path))
+
+            elif kind == _HTTP_END:
+                # HTTP 请求结束
+                request_id, status, elapsed = record.group(9, 10, 11)
+                start = http_starts.pop(request_id, None)
+                if start is not None:
+                    http_ended_elapsed_append(float(elapsed))
+                    http_ended_method_append(start[1])
+                    http_ended_path_append(start[2])
+                    http_ended_status_append(intern(status))
+
+            elif kind == _REQ_SLOW:
+                # 慢请求
+                req_id, elapsed, caller = record.group(12, 13, 14)
+                slow_requests_append({
+                    'req_id': req_id,
+                    'timestamp': timestamp,
+                    'elapsed': float(elapsed),
+                    'caller': intern(caller)
+                })
+
+            else:
+                # 超时
+                req_id, url, elapsed = record.group(15, 16, 17)
+                timeouts_append({
+                    'req_id': req_id,
+                    'timestamp': timestamp,
+                    'url': intern(url),
+                    'elapsed': float(elapsed)
+                })
+
+        self.concurrent_peak = concurrent_peak
+        self.http_started = http_started
+        self.api_started = api_started
+
+    def analyze_file(self, file_handle):
+        """分析日志文件（file_handle 需以二进制模式打开）"""
+        # 按 64KB 块读取，手动切行，减少 readline 的系统调用和逐行对象开销
+        process_block = self._process_block
+        read = file_handle.read
+        tail = b''
+        while True:
+            chunk = read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+
+            chunk = tail + chunk
+            cut = chunk.rfind(b'\n') + 1
+            if not cut:
+                tail = chunk
                 continue
+
+            tail = chunk[cut:]
+            process_block(chunk[:cut].decode('utf-8', 'replace'))
+
+        if tail:
+            process_block(tail.decode('utf-8', 'replace'))
     
     def generate_report(self):
         """生成分析报告"""
@@ -174,8 +352,8 @@ class LogAnalyzer:
         # 1. 总体统计
         print("\n【1. 总体统计】")
         print("-" * 70)
-        print("HTTP 请求总数: %d" % len(self.http_requests))
-        print("API 调用总数: %d" % len(self.api_requests))
+        print("HTTP 请求总数: %d" % self.http_started)
+        print("API 调用总数: %d" % self.api_started)
         print("慢请求数量: %d" % len(self.slow_requests))
         print("超时数量: %d" % len(self.timeouts))
         print("并发峰值: %d" % self.concurrent_peak)
@@ -183,66 +361,70 @@ class LogAnalyzer:
         # 2. HTTP 响应时间分析
         print("\n【2. HTTP 响应时间分析】")
         print("-" * 70)
-        http_elapsed = [req['elapsed'] for req in self.http_requests.values() if 'elapsed' in req]
+        http_elapsed = self.http_ended_elapsed
         if http_elapsed:
-            print("平均响应时间: %.3fs" % (sum(http_elapsed) / len(http_elapsed)))
-            print("最大响应时间: %.3fs" % max(http_elapsed))
-            print("最小响应时间: %.3fs" % min(http_elapsed))
+            http_avg, http_max, http_min = _stats(http_elapsed)
+            print("平均响应时间: %.3fs" % http_avg)
+            print("最大响应时间: %.3fs" % http_max)
+            print("最小响应时间: %.3fs" % http_min)
             
             # 找出最慢的 HTTP 请求
-            slow_http = sorted(
-                [(req_id, req) for req_id, req in self.http_requests.items() if 'elapsed' in req],
-                key=lambda x: x[1]['elapsed'],
-                reverse=True
-            )[:10]
+            slow_http = _top_indices(http_elapsed, 10)
             
             print("\n最慢的 10 个 HTTP 请求:")
-            for req_id, req in slow_http:
+            for i in slow_http:
                 print("  %.3fs - %s %s (status=%s)" % (
-                    req['elapsed'], req['method'], req['path'], req.get('status', 'unknown')
+                    http_elapsed[i], self.http_ended_method[i], self.http_ended_path[i],
+                    self.http_ended_status[i]
                 ))
         
         # 3. API 调用分析
         print("\n【3. API 调用响应时间分析】")
         print("-" * 70)
-        api_elapsed = [req['elapsed'] for req in self.api_requests.values() if 'elapsed' in req]
+        api_elapsed = self.api_ended_elapsed
+        api_max = None
         if api_elapsed:
-            print("API 调用平均时间: %.3fs" % (sum(api_elapsed) / len(api_elapsed)))
-            print("API 调用最大时间: %.3fs" % max(api_elapsed))
+            api_avg, api_max, _ = _stats(api_elapsed)
+            print("API 调用平均时间: %.3fs" % api_avg)
+            print("API 调用最大时间: %.3fs" % api_max)
             
-            # 按 URL 分组统计
-            url_stats = defaultdict(lambda: {'count': 0, 'total': 0, 'max': 0})
-            for req in self.api_requests.values():
-                if 'elapsed' in req:
-                    url = req['url']
-                    url_stats[url]['count'] += 1
-                    url_stats[url]['total'] += req['elapsed']
-                    url_stats[url]['max'] = max(url_stats[url]['max'], req['elapsed'])
+            # 按 URL 分组统计，用平行数组存放，url_index 记录 URL 对应的下标
+            url_index = {}
+            url_counts = []
+            url_totals = []
+            url_maxes = []
+            for url, elapsed in zip(self.api_ended_url, api_elapsed):
+                idx = url_index.get(url)
+                if idx is None:
+                    idx = url_index[url] = len(url_counts)
+                    url_counts.append(0)
+                    url_totals.append(0.0)
+                    url_maxes.append(0.0)
+                url_counts[idx] += 1
+                url_totals[idx] += elapsed
+                if elapsed > url_maxes[idx]:
+                    url_maxes[idx] = elapsed
             
             print("\n按 API 端点统计 (Top 10):")
-            sorted_urls = sorted(
-                url_stats.items(),
-                key=lambda x: x[1]['total'],
-                reverse=True
-            )[:10]
+            urls = list(url_index)
+            top_idx = heapq.nlargest(10, range(len(url_counts)), key=url_totals.__getitem__)
             
-            for url, stats in sorted_urls:
-                avg = stats['total'] / stats['count']
-                print("  %s" % url)
+            for idx in top_idx:
+                avg = url_totals[idx] / url_counts[idx]
+                print("  %s" % urls[idx])
                 print("    调用次数: %d, 平均: %.3fs, 最大: %.3fs, 总计: %.3fs" % (
-                    stats['count'], avg, stats['max'], stats['total']
+                    url_counts[idx], avg, url_maxes[idx], url_totals[idx]
                 ))
         
         # 4. 慢请求详情
         if self.slow_requests:
             print("\n【4. 慢请求详情 (>2s)】")
             print("-" * 70)
-            for req in sorted(self.slow_requests, key=lambda x: x['elapsed'], reverse=True)[:20]:
+            for req in heapq.nlargest(20, self.slow_requests, key=lambda x: x['elapsed']):
                 print("  [%s] 耗时: %.3fs" % (req['timestamp'].strftime('%H:%M:%S'), req['elapsed']))
                 print("    调用者: %s" % req['caller'])
-                if req['req_id'] in self.api_requests:
-                    api_req = self.api_requests[req['req_id']]
-                    print("    URL: %s" % api_req.get('url', 'unknown'))
+                if req['req_id'] in self.api_urls:
+                    print("    URL: %s" % self.api_urls[req['req_id']])
                 print()
         
         # 5. 超时详情
@@ -259,21 +441,19 @@ class LogAnalyzer:
         # 6. 并发情况分析
         print("\n【6. 并发情况分析】")
         print("-" * 70)
-        active_counts = [req['active_count_start'] for req in self.api_requests.values() 
-                        if 'active_count_start' in req]
+        active_counts = self.api_start_active
         if active_counts:
-            print("平均并发: %.1f" % (sum(active_counts) / len(active_counts)))
-            print("最大并发: %d" % max(active_counts))
+            active_avg, active_max, _ = _stats(active_counts)
+            print("平均并发: %.1f" % active_avg)
+            print("最大并发: %d" % active_max)
             
             # 统计并发分布
-            from collections import Counter
-            count_dist = Counter(active_counts)
             print("\n并发分布:")
-            for count in sorted(count_dist.keys()):
+            for count, times in _distribution(active_counts):
                 print("  并发=%d: %d 次 (%s)" % (
                     count, 
-                    count_dist[count],
-                    '#' * min(50, count_dist[count] // 10)
+                    times,
+                    '#' * min(50, times // 10)
                 ))
         
         # 7. 关键发现
@@ -288,8 +468,8 @@ class LogAnalyzer:
         if self.concurrent_peak > 5:
             findings.append("⚠️  并发峰值达到 %d，超过单线程处理能力" % self.concurrent_peak)
         
-        if api_elapsed and max(api_elapsed) > 10:
-            findings.append("⚠️  发现超长 API 调用 (%.3fs)，可能导致阻塞" % max(api_elapsed))
+        if api_elapsed and api_max > 10:
+            findings.append("⚠️  发现超长 API 调用 (%.3fs)，可能导致阻塞" % api_max)
         
         slow_callers = defaultdict(int)
         for req in self.slow_requests:
@@ -314,17 +494,25 @@ class LogAnalyzer:
 
 
 def main():
-    if len(sys.argv) > 1 and sys.argv[1] != '-':
+    parser = argparse.ArgumentParser(description='分析增强日志找出 504 超时根因')
+    parser.add_argument('logfile', nargs='?', default='-', help='日志文件，- 或省略时从 stdin 读取')
+    parser.add_argument('--scanner', choices=sorted(SCANNERS), default='re', help='标签扫描器（默认 re）')
+    args = parser.parse_args()
+
+    try:
+        analyzer = LogAnalyzer(scanner=args.scanner)
+    except ValueError as e:
+        # 所选扫描器的可选依赖没有安装
+        parser.error(str(e))
+
+    if args.logfile != '-':
         # 从文件读取
-        with open(sys.argv[1], 'r') as f:
-            analyzer = LogAnalyzer()
+        with open(args.logfile, 'rb') as f:
             analyzer.analyze_file(f)
-            analyzer.generate_report()
     else:
         # 从 stdin 读取
-        analyzer = LogAnalyzer()
-        analyzer.analyze_file(sys.stdin)
-        analyzer.generate_report()
+        analyzer.analyze_file(sys.stdin.buffer)
+    analyzer.generate_report()
 
 
 if __name__ == "__main__":
@@ -13,11 +13,17 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-# PyMySQL 兼容层 - 必须在所有导入之前
-import pymysql
-pymysql.install_as_MySQLdb()
+# 数据库驱动：优先使用 mysqlclient（C 实现，行解析快得多），
+# 未安装时回退到 PyMySQL 兼容层 - 必须在所有导入之前
+try:
+    import MySQLdb
+    import MySQLdb.cursors
+except ImportError:
+    import pymysql
+    pymysql.install_as_MySQLdb()
 
 import os
+import itertools
 import traceback
 import logging
 from flask import Flask, request
@@ -30,12 +36,21 @@ app.config.from_object("rrd.config")
 babel = Babel(app)
 
 import time
+import threading
 from flask import request, g
+from rrd.store import log_thread_name
+
+# 单调递增的请求ID：id(request) 会在对象释放后被复用，不利于日志关联
+# 计数器是进程内的，gunicorn 多个 worker 写同一个日志，所以加上 pid 前缀
+_req_id_counter = itertools.count(1)
 
 @app.before_request
 def before_request():
     g.request_start_time = time.time()
-    g.request_id = id(request)
+    g.request_id = "%d-%d" % (os.getpid(), next(_req_id_counter))
+    # DB 日志带上请求ID，便于和 HTTP_START/HTTP_END 关联
+    g.log_thread_token = log_thread_name.set(
+        "%s/req=%s" % (threading.current_thread().name, g.request_id))
     
     logging.warning(
         "[HTTP_START] request_id=%s method=%s path=%s remote_addr=%s",
@@ -61,6 +76,12 @@ def after_request(response):
     
     return response
 
+@app.teardown_request
+def reset_log_thread_name(exception):
+    token = g.pop('log_thread_token', None)
+    if token is not None:
+        log_thread_name.reset(token)
+
 @app.errorhandler(Exception)
 def all_exception_handler(error):
     # 【止血修复】确保异常路径也记录请求耗时，用于诊断
@@ -17,6 +17,10 @@
 # app config
 import os
 LOG_LEVEL = os.environ.get("LOG_LEVEL",'DEBUG')
+# buffer up to N log records in memory, flushed on ERROR, when full or every LOG_BUFFER_FLUSH_INTERVAL seconds.
+# buffered records are lost when a hung worker is killed, so 0 (no buffering) is the default
+LOG_BUFFER_CAPACITY = int(os.environ.get("LOG_BUFFER_CAPACITY",0))
+LOG_BUFFER_FLUSH_INTERVAL = float(os.environ.get("LOG_BUFFER_FLUSH_INTERVAL",1))
 SECRET_KEY = os.environ.get("SECRET_KEY","secret-key")
 PERMANENT_SESSION_LIFETIME = os.environ.get("PERMANENT_SESSION_LIFETIME",3600 * 24 * 30)
 SITE_COOKIE = os.environ.get("SITE_COOKIE","open-falcon-ck")
@@ -44,6 +48,17 @@ ALARM_DB_USER = os.environ.get("ALARM_DB_USER","root")
 ALARM_DB_PASS = os.environ.get("ALARM_DB_PASS","")
 ALARM_DB_NAME = os.environ.get("ALARM_DB_NAME","alarms")
 
+# database connection pool, shared by portal and alarm databases
+DB_POOL_MINCACHED = int(os.environ.get("DB_POOL_MINCACHED",2))
+DB_POOL_MAXCACHED = int(os.environ.get("DB_POOL_MAXCACHED",10))
+# hard cap on open connections per database, callers wait for a free one; 0 means unlimited
+DB_POOL_MAXCONNECTIONS = int(os.environ.get("DB_POOL_MAXCONNECTIONS",0))
+# how many times a query is retried on a fresh connection after a connection error
+DB_RETRY_MAX = int(os.environ.get("DB_RETRY_MAX",3))
+# after N queries in a row fail on connection errors, fail fast for a cooldown of M seconds; 0 disables
+DB_BREAKER_THRESHOLD = int(os.environ.get("DB_BREAKER_THRESHOLD",5))
+DB_BREAKER_COOLDOWN = float(os.environ.get("DB_BREAKER_COOLDOWN",30))
+
 # ldap config
 LDAP_ENABLED = os.environ.get("LDAP_ENABLED",False)
 LDAP_SERVER = os.environ.get("LDAP_SERVER","ldap.forumsys.com:389")
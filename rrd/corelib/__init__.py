@@ -14,58 +14,71 @@
 # limitations under the License.
 
 
+import sys
 import requests
+from requests.adapters import HTTPAdapter
+from http.cookiejar import DefaultCookiePolicy
 import json
 import time
-import logging
+import itertools
 import threading
-
-# 用于追踪活跃请求
-_active_requests = {}
-_active_requests_lock = threading.Lock()
-_request_counter = 0
-_request_counter_lock = threading.Lock()
+from rrd.utils.logger import logging
+
+logger = logging.getLogger()
+
+# 用于追踪活跃请求：请求ID由 itertools.count 生成（next() 在 GIL 下是原子的），
+# 只需要一个小锁维护活跃请求数
+_request_counter = itertools.count(1)
+_active_count = [0]
+_active_count_lock = threading.Lock()
+
+# 复用同一个 Session 的连接池，避免每次 API 调用都重新建立 TCP 连接
+_session = requests.Session()
+_session.mount('http://', HTTPAdapter(pool_connections=16, pool_maxsize=32))
+_session.mount('https://', HTTPAdapter(pool_connections=16, pool_maxsize=32))
+# Session 在所有用户间共享，不能保存后端返回的 cookie
+_session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+_METHOD_MAP = {
+    "POST": _session.post,
+    "GET": _session.get,
+    "PUT": _session.put,
+    "DELETE": _session.delete,
+}
 
 def auth_requests(method, *args, **kwargs):
     from flask import g
-    import time
-    import traceback
 
     # 生成请求ID
-    global _request_counter
-    with _request_counter_lock:
-        _request_counter += 1
-        request_id = _request_counter
+    request_id = next(_request_counter)
 
-    # 获取调用栈信息
-    stack = traceback.extract_stack()
+    # 获取调用栈信息：沿 f_back 向外找调用者，不用 extract_stack 避免读源码文件
+    frame = sys._getframe(1)
     caller = "unknown"
-    for frame in reversed(stack[:-1]):  # 倒序找调用者
-        if 'rrd/' in frame.filename and '__init__.py' not in frame.filename:
-            caller = "%s:%s:%s" % (frame.filename.split('rrd/')[-1], frame.lineno, frame.name)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if 'rrd/' in filename and '__init__.py' not in filename:
+            caller = "%s:%s:%s" % (filename.split('rrd/')[-1], frame.f_lineno, frame.f_code.co_name)
             break
+        frame = frame.f_back
 
     # 记录请求开始
     start_time = time.time()
     url = args[0] if args else kwargs.get('url', 'unknown')
 
-    with _active_requests_lock:
-        active_count = len(_active_requests)
-        _active_requests[request_id] = {
-            'method': method,
-            'url': url,
-            'start': start_time,
-            'caller': caller,
-            'thread': threading.current_thread().name
-        }
-
-    logging.warning(
-        "[REQ_START] id=%d method=%s url=%s caller=%s thread=%s active_count=%d",
-        request_id, method, url, caller, threading.current_thread().name, active_count
-    )
+    with _active_count_lock:
+        active_count = _active_count[0]
+        _active_count[0] += 1
+
+    # WARNING 级别被过滤时跳过参数构造；ERROR 路径保持无条件记录
+    if logger.isEnabledFor(logging.WARNING):
+        logger.warning(
+            "[REQ_START] id=%d method=%s url=%s caller=%s thread=%s active_count=%d",
+            request_id, method, url, caller, threading.current_thread().name, active_count
+        )
 
     if not g.user_token:
-        logging.error("[REQ_ERROR] id=%d error=no_api_token", request_id)
+        logger.error("[REQ_ERROR] id=%d error=no_api_token", request_id)
         raise Exception("no api token")
 
     headers = {
@@ -84,28 +97,23 @@ def auth_requests(method, *args, **kwargs):
     try:
         # 【止血修复】确保所有请求都有超时限制，避免线程无限阻塞
         if 'timeout' not in kwargs:
-            kwargs['timeout'] = 10  # 10秒超时
+            kwargs['timeout'] = (3, 10)  # 连接 3 秒，读取 10 秒超时
         
-        if method == "POST":
-            response = requests.post(*args, headers=headers, **kwargs)
-        elif method == "GET":
-            response = requests.get(*args, headers=headers, **kwargs)
-        elif method == "PUT":
-            response = requests.put(*args, headers=headers, **kwargs)
-        elif method == "DELETE":
-            response = requests.delete(*args, headers=headers, **kwargs)
-        else:
+        request_fn = _METHOD_MAP.get(method)
+        if request_fn is None:
             raise Exception("invalid http method")
+        response = request_fn(*args, headers=headers, **kwargs)
 
         # 记录响应
         elapsed = time.time() - start_time
-        logging.warning(
-            "[REQ_SUCCESS] id=%d method=%s url=%s status=%d elapsed=%.3fs",
-            request_id, method, url, response.status_code, elapsed
-        )
+        if logger.isEnabledFor(logging.WARNING):
+            logger.warning(
+                "[REQ_SUCCESS] id=%d method=%s url=%s status=%d elapsed=%.3fs",
+                request_id, method, url, response.status_code, elapsed
+            )
 
         if elapsed > 2.0:
-            logging.error(
+            logger.error(
                 "[REQ_SLOW] id=%d method=%s url=%s elapsed=%.3fs caller=%s",
                 request_id, method, url, elapsed, caller
             )
@@ -114,7 +122,7 @@ def auth_requests(method, *args, **kwargs):
 
     except requests.exceptions.Timeout as e:
         elapsed = time.time() - start_time
-        logging.error(
+        logger.error(
             "[REQ_TIMEOUT] id=%d method=%s url=%s elapsed=%.3fs caller=%s thread=%s error=%s",
             request_id, method, url, elapsed, caller, threading.current_thread().name, str(e)
         )
@@ -122,7 +130,7 @@ def auth_requests(method, *args, **kwargs):
 
     except requests.exceptions.ConnectionError as e:
         elapsed = time.time() - start_time
-        logging.error(
+        logger.error(
             "[REQ_CONN_ERROR] id=%d method=%s url=%s elapsed=%.3fs caller=%s thread=%s error=%s",
             request_id, method, url, elapsed, caller, threading.current_thread().name, str(e)
         )
@@ -130,21 +138,21 @@ def auth_requests(method, *args, **kwargs):
 
     except Exception as e:
         elapsed = time.time() - start_time
-        logging.error(
+        logger.error(
             "[REQ_EXCEPTION] id=%d method=%s url=%s elapsed=%.3fs caller=%s thread=%s error=%s",
             request_id, method, url, elapsed, caller, threading.current_thread().name, str(e)
         )
         raise
 
     finally:
-        with _active_requests_lock:
-            if request_id in _active_requests:
-                del _active_requests[request_id]
-            active_count = len(_active_requests)
-
-        elapsed = time.time() - start_time
-        logging.warning(
-            "[REQ_END] id=%d elapsed=%.3fs active_count=%d",
-            request_id, elapsed, active_count
-        )
+        with _active_count_lock:
+            _active_count[0] -= 1
+            active_count = _active_count[0]
+
+        if logger.isEnabledFor(logging.WARNING):
+            elapsed = time.time() - start_time
+            logger.warning(
+                "[REQ_END] id=%d elapsed=%.3fs active_count=%d",
+                request_id, elapsed, active_count
+            )
 
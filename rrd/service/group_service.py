@@ -23,18 +23,15 @@ log = logging.getLogger(__file__)
 
 def delete_group(group_id=None):
     try:
-        cursor = db.execute('delete from grp where id = %s', [group_id])
-        db.execute('delete from grp_host where grp_id = %s', [group_id], cursor=cursor)
-        db.execute('delete from grp_tpl where grp_id = %s', [group_id], cursor=cursor)
-        db.execute('delete from plugin_dir where grp_id = %s', [group_id], cursor=cursor)
-        db.commit()
+        with db.transaction():
+            db.execute('delete from grp where id = %s', [group_id])
+            db.execute('delete from grp_host where grp_id = %s', [group_id])
+            db.execute('delete from grp_tpl where grp_id = %s', [group_id])
+            db.execute('delete from plugin_dir where grp_id = %s', [group_id])
         return ''
     except Exception as e:
         log.error(e)
-        db.rollback()
         return 'delete group %s fail' % group_id
-    finally:
-        cursor and cursor.close()
 
 
 def rename(old_str=None, new_str=None, login_user=None):
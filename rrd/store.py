@@ -15,16 +15,84 @@
 
 
 import MySQLdb
+import asyncio
+import contextlib
+import contextvars
+import keyword
+import random
+import time
 import threading
+import types
+from concurrent.futures import Future, ThreadPoolExecutor
+from dbutils.pooled_db import PooledDB
 from rrd import config
 from rrd.utils.logger import logging
 
+# optional, only needed by DB.query_arrays
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# optional asyncio driver for AsyncDB, asyncmy parses rows in C and is preferred
+try:
+    import asyncmy as aiodriver
+except ImportError:
+    try:
+        import aiomysql as aiodriver
+    except ImportError:
+        aiodriver = None
+
+logger = logging.getLogger()
+_current_thread = threading.current_thread
+
+# thread label for DB log lines, set once per request by the app so log
+# calls reuse it instead of looking the thread up again
+log_thread_name = contextvars.ContextVar('log_thread_name', default=None)
+
+def _thread_label():
+    return log_thread_name.get() or _current_thread().name
+
+# retry backoff in seconds: min(cap, base * 2**attempt) plus up to base of jitter,
+# so threads that lost their connections together do not reconnect together
+RETRY_BACKOFF_BASE = 0.05
+RETRY_BACKOFF_CAP = 1.0
+
+_RECONNECT_ERRORS = (MySQLdb.OperationalError, MySQLdb.InterfaceError, MySQLdb.InternalError)
+
+# the drivers raise OperationalError for errors the server answered as well
+# (1054 unknown column, 1205 lock wait timeout, 1213 deadlock); only client
+# side CR_* errors, 2000-2999 (2003 can't connect, 2006 server gone away,
+# 2013 lost connection, 2055 lost with system error), mean the connection is
+# gone and a reconnect can help
+def _connection_lost(e):
+    errno = e.args[0] if e.args else None
+    if isinstance(e, MySQLdb.InterfaceError) or not isinstance(errno, int):
+        return True
+    return 2000 <= errno < 3000
+
+# only called from the log branches, never on the query fast path
+def _preview(a):
+    if not a:
+        return 'unknown'
+    sql = a[0]
+    return (sql if isinstance(sql, str) else str(sql))[:50]  # 只记录前50字符
+
+def _backoff(attempt):
+    return min(RETRY_BACKOFF_CAP, RETRY_BACKOFF_BASE * 2 ** attempt) + random.uniform(0, RETRY_BACKOFF_BASE)
+
 portal_db_cfg = {
         "DB_HOST": config.PORTAL_DB_HOST,
         "DB_PORT": config.PORTAL_DB_PORT,
         "DB_USER": config.PORTAL_DB_USER,
         "DB_PASS": config.PORTAL_DB_PASS,
         "DB_NAME": config.PORTAL_DB_NAME,
+        "POOL_MINCACHED": config.DB_POOL_MINCACHED,
+        "POOL_MAXCACHED": config.DB_POOL_MAXCACHED,
+        "POOL_MAXCONNECTIONS": config.DB_POOL_MAXCONNECTIONS,
+        "RETRY_MAX": config.DB_RETRY_MAX,
+        "BREAKER_THRESHOLD": config.DB_BREAKER_THRESHOLD,
+        "BREAKER_COOLDOWN": config.DB_BREAKER_COOLDOWN,
 }
 
 alarm_db_cfg = {
@@ -33,11 +101,16 @@ alarm_db_cfg = {
         "DB_USER": config.ALARM_DB_USER,
         "DB_PASS": config.ALARM_DB_PASS,
         "DB_NAME": config.ALARM_DB_NAME,
+        "POOL_MINCACHED": config.DB_POOL_MINCACHED,
+        "POOL_MAXCACHED": config.DB_POOL_MAXCACHED,
+        "POOL_MAXCONNECTIONS": config.DB_POOL_MAXCONNECTIONS,
+        "RETRY_MAX": config.DB_RETRY_MAX,
+        "BREAKER_THRESHOLD": config.DB_BREAKER_THRESHOLD,
+        "BREAKER_COOLDOWN": config.DB_BREAKER_COOLDOWN,
 }
 
-def connect_db(cfg):
-    try:
-        conn = MySQLdb.connect(
+def _connect_args(cfg):
+    return dict(
             host=cfg['DB_HOST'],
             port=cfg['DB_PORT'],
             user=cfg['DB_USER'],
@@ -45,102 +118,401 @@ def connect_db(cfg):
             db=cfg['DB_NAME'],
             use_unicode=True,
             charset="utf8")
+
+def connect_db(cfg):
+    try:
+        conn = MySQLdb.connect(**_connect_args(cfg))
         return conn
     except Exception as e:
-        logging.getLogger().critical('connect db: %s' % e)
+        logger.critical('connect db: %s' % e)
         return None
 
+# connections are pinged when checked out and go back to the pool on close()
+# connections are never shared between threads; once maxconnections is
+# reached, checkout blocks until another thread gives one back.
+# isfatal keeps SteadyDB from replaying a statement the server rejected
+def create_pool(cfg, creator=MySQLdb):
+    return PooledDB(
+            creator=creator,
+            mincached=cfg.get('POOL_MINCACHED', 2),
+            maxcached=cfg.get('POOL_MAXCACHED', 10),
+            maxshared=0,
+            maxconnections=cfg.get('POOL_MAXCONNECTIONS', 0),
+            blocking=True,
+            ping=1,
+            isfatal=_connection_lost,
+            **_connect_args(cfg))
+
+
+class CircuitOpenError(MySQLdb.OperationalError):
+    pass
+
+# stops retry storms against a database that keeps failing: after `threshold`
+# queries in a row give up on connection errors, calls fail fast for `cooldown`
+# seconds, then one probe call is let through; its success closes the circuit
+class Breaker(object):
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        if self.state == 'closed':
+            return True
+        with self._lock:
+            # a probe that never reported back is replaced after another cooldown
+            if time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = 'half_open'
+                self.opened_at = time.monotonic()
+                return True
+            return self.state == 'closed'
+
+    def success(self):
+        if self.failures or self.state != 'closed':
+            with self._lock:
+                self.failures = 0
+                self.state = 'closed'
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.threshold and (self.state == 'half_open' or self.failures >= self.threshold):
+                if self.state != 'open':
+                    logger.error("[DB_BREAKER] open failures=%d cooldown=%.1fs", self.failures, self.cooldown)
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+
+# source of the methods generated by DB.register_query
+_QUERY_TEMPLATE = """
+def %(name)s(self%(sig)s):
+    params = %(params)s
+    self._check_breaker()
+    try:
+        cursor = self._get_cursor()
+        cursor.execute(SQL, params)
+    except MySQLdb.Error as e:
+        cursor = self._execute_slow((SQL, params), {}, time.perf_counter(), e)
+    self._breaker.success()
+    return cursor.fetchall()
+"""
+
 
 class DB(object):
     def __init__(self, cfg):
         self.config = cfg
+        self._breaker = Breaker(cfg.get('BREAKER_THRESHOLD', 0), cfg.get('BREAKER_COOLDOWN', 30))
         self._local = threading.local()
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._executor = None
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
 
     def _set_conn(self, conn):
         self._local.conn = conn
+        self._local.cursor = None
 
     def _get_conn(self):
         return getattr(self._local, "conn", None)
 
+    # the pool is created lazily so importing this module never touches the database
+    def _get_pool(self):
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = create_pool(self.config)
+        return self._pool
+
     def get_conn(self):
         conn = self._get_conn()
         if conn is None:
-            conn = connect_db(self.config)
+            try:
+                conn = self._get_pool().connection()
+            except Exception as e:
+                logger.critical('connect db: %s' % e)
+                conn = None
             self._set_conn(conn)
         return conn
 
+    # reuse one cursor per connection instead of allocating one per query
+    def _get_cursor(self):
+        cursor = getattr(self._local, "cursor", None)
+        # a closed cursor drops its connection reference
+        if cursor is None or cursor.connection is None:
+            conn = self.get_conn()
+            # 连接失败显式报成可重试的错误，而不是靠 None.cursor() 抛 AttributeError
+            if conn is None:
+                raise MySQLdb.OperationalError(2003, "can't connect to database")
+            cursor = conn.cursor()
+            self._local.cursor = cursor
+        return cursor
+
+    # drop the broken connection, the next _get_cursor() checks out a new one
+    def _reconnect(self, attempt):
+        conn = self._get_conn()
+        try:
+            conn and conn.close()
+        except _RECONNECT_ERRORS:
+            pass
+        self._set_conn(None)
+        time.sleep(_backoff(attempt))
+
+    def _check_breaker(self):
+        if not self._breaker.allow():
+            raise CircuitOpenError(2003, "circuit open, database marked down")
+
     def execute(self, *a, **kw):
-        import time
-        import threading
-        
         cursor = kw.pop('cursor', None)
-        start_time = time.time()
-        sql_preview = str(a[0])[:50] if a else 'unknown'  # 只记录前50字符
-        thread_id = threading.current_thread().name
-        
+        start_time = time.perf_counter()
+        self._check_breaker()
+
         try:
-            cursor = cursor or self.get_conn().cursor()
+            cursor = cursor or self._get_cursor()
             cursor.execute(*a, **kw)
-            
-            # 【止血修复】记录慢查询，用于后续根因诊断
-            elapsed = time.time() - start_time
-            if elapsed > 0.1:  # 100ms
-                logging.warning(
-                    "[DB_SLOW] thread=%s sql=%s elapsed=%.3fs",
-                    thread_id, sql_preview, elapsed
-                )
-            
-        except (AttributeError, MySQLdb.OperationalError, MySQLdb.InterfaceError, MySQLdb.InternalError) as e:
-            # 【止血修复】记录 DB 重连，这可能是并发访问的信号
-            elapsed = time.time() - start_time
-            logging.error(
-                "[DB_RECONNECT] thread=%s sql=%s elapsed=%.3fs error=%s",
-                thread_id, sql_preview, elapsed, str(e)
+        except MySQLdb.Error as e:
+            cursor = self._execute_slow(a, kw, start_time, e)
+        self._breaker.success()
+
+        # 【止血修复】记录慢查询，用于后续根因诊断
+        # 线程名和 SQL 预览只在真正要打日志时才构造
+        elapsed = time.perf_counter() - start_time
+        if elapsed > 0.1 and logger.isEnabledFor(logging.WARNING):  # 100ms
+            logger.warning(
+                "[DB_SLOW] thread=%s sql=%s elapsed=%.3fs",
+                _thread_label(), _preview(a), elapsed
             )
-            
-            conn = self._get_conn()
-            conn and conn.close()
-            self._set_conn(None)
-            cursor = self.get_conn().cursor()
-            cursor.execute(*a, **kw)
-        
+
         return cursor
 
+    # error path of every query method, kept out of the common case: errors
+    # the server answered are re-raised and count as breaker success, a lost
+    # connection is reconnected and `method` retried up to RETRY_MAX times;
+    # giving up counts as a breaker failure
+    def _execute_slow(self, a, kw, start_time, e, method='execute'):
+        attempt = 0
+        while True:
+            # 服务端已经应答的错误换条连接重试只会再错一次，还会重放写操作
+            if not _connection_lost(e):
+                self._breaker.success()
+                raise e
+            # 【止血修复】记录 DB 重连，这可能是并发访问的信号
+            elapsed = time.perf_counter() - start_time
+            logger.error(
+                "[DB_RECONNECT] thread=%s sql=%s elapsed=%.3fs attempt=%d error=%s",
+                _thread_label(), _preview(a), elapsed, attempt, str(e)
+            )
+            # 事务中重连会丢掉之前未提交的语句，只能交给调用方回滚
+            if attempt >= self.config.get('RETRY_MAX', 1) or self._in_transaction():
+                self._breaker.failure()
+                raise e
+            # 指数退避 + 抖动，避免所有线程同时重连压垮数据库
+            self._reconnect(attempt)
+            attempt += 1
+            try:
+                cursor = self._get_cursor()
+                getattr(cursor, method)(*a, **kw)
+                return cursor
+            except MySQLdb.Error as err:
+                e = err
+
     # insert one record in a transaction
     # return last id
     def insert(self, *a, **kw):
-        cursor = None
         try:
             cursor = self.execute(*a, **kw)
             row_id = cursor.lastrowid
-            self.commit()
+            self._autocommit()
             return row_id
         except MySQLdb.IntegrityError:
+            if self._in_transaction():
+                raise
             self.rollback()
-        finally:
-            cursor and cursor.close()
 
     # update in a transaction
     # return affected row count
     def update(self, *a, **kw):
-        cursor = None
         try:
             cursor = self.execute(*a, **kw)
-            self.commit()
+            self._autocommit()
             row_count = cursor.rowcount
             return row_count
         except MySQLdb.IntegrityError:
+            if self._in_transaction():
+                raise
             self.rollback()
+
+    # run one statement per chunk of params; pymysql rewrites INSERT/REPLACE
+    # ... VALUES into a single multi-row statement for each chunk
+    def executemany(self, sql, seq_of_params):
+        self._check_breaker()
+        try:
+            cursor = self._get_cursor()
+            cursor.executemany(sql, seq_of_params)
+        except MySQLdb.Error as e:
+            cursor = self._execute_slow((sql, seq_of_params), {}, time.perf_counter(), e, 'executemany')
+        self._breaker.success()
+        return cursor
+
+    # all chunks run inside one transaction() and are committed together;
+    # a connection error part way through is not retried, it rolls back the batch
+    def _execute_chunks(self, sql, seq_of_params, chunk):
+        seq_of_params = list(seq_of_params)
+        for i in range(0, len(seq_of_params), chunk):
+            yield self.executemany(sql, seq_of_params[i:i + chunk])
+
+    # insert records in batches of `chunk` rows, committed once at the end
+    # return the first id generated by the last batch, None when a duplicate
+    # key rolled the whole batch back
+    def insert_many(self, sql, seq_of_params, chunk=1000):
+        row_id = None
+        try:
+            with self.transaction():
+                for cursor in self._execute_chunks(sql, seq_of_params, chunk):
+                    row_id = cursor.lastrowid
+            return row_id
+        except MySQLdb.IntegrityError:
+            # 外层事务必须知道这批数据没有写入
+            if self._in_transaction():
+                raise
+            return None
+
+    # update in batches of `chunk` rows, committed once at the end
+    # return total affected row count, None when the batch was rolled back
+    def update_many(self, sql, seq_of_params, chunk=1000):
+        row_count = 0
+        try:
+            with self.transaction():
+                for cursor in self._execute_chunks(sql, seq_of_params, chunk):
+                    row_count += cursor.rowcount
+            return row_count
+        except MySQLdb.IntegrityError:
+            if self._in_transaction():
+                raise
+            return None
+
+    # run the query on a worker thread with a connection from the pool and
+    # return a Future of the fetched rows, so independent queries overlap:
+    #
+    #     futs = [db.execute_async(sql, [p]) for p in params]
+    #     results = [f.result() for f in futs]
+    #
+    # each call is committed on its own and never joins the caller's transaction()
+    def execute_async(self, *a, **kw):
+        if self._executor is None:
+            with self._pool_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                            max_workers=self.config.get('POOL_MAXCACHED', 10),
+                            thread_name_prefix='db-async')
+        return self._executor.submit(self._execute_task, a, kw)
+
+    def _execute_task(self, a, kw):
+        try:
+            rows = self.execute(*a, **kw).fetchall()
+            self.commit()
+            return rows
+        except BaseException:
+            self.rollback()
+            raise
         finally:
-            cursor and cursor.close()
+            # an idle worker must not keep a connection out of the pool
+            self.close()
+
+    # with coalesce=True identical reads issued while one is still running
+    # wait for its result instead of hitting the database again:
+    #
+    #     rows = db.query_all("select hostname from host", coalesce=True)
+    #
+    # the shared read may have started before the caller's last commit and
+    # miss its writes, so this is opt-in for read-only dashboard queries.
+    # reads inside transaction() are never shared
+    def _coalesce_key(self, a, kw):
+        if kw or not a or self._in_transaction():
+            return None
+        params = a[1] if len(a) > 1 else None
+        key = (a[0], tuple(params) if isinstance(params, list) else params) + a[2:]
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
 
     def query_all(self, *a, **kw):
-        cursor = None
+        key = self._coalesce_key(a, kw) if kw.pop('coalesce', False) else None
+        if key is None:
+            # fetchall drains the cached cursor, so it can be reused as is
+            return self.execute(*a, **kw).fetchall()
+
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            return future.result()
+
         try:
-            cursor = self.execute(*a, **kw)
-            return cursor.fetchall()
+            rows = self.execute(*a, **kw).fetchall()
+            future.set_result(rows)
+            return rows
+        except BaseException as e:
+            future.set_exception(e)
+            raise
         finally:
-            cursor and cursor.close()
+            with self._inflight_lock:
+                del self._inflight[key]
+
+    # generate a specialised reader for a hot query template:
+    #
+    #     db.register_query('host_id', 'select id from host where hostname = %s', 1)
+    #     rows = db.q_host_id(hostname)
+    #
+    # the method takes exactly `nparams` positional arguments and skips the
+    # generic *a/**kw handling, read coalescing and slow query logging; the
+    # circuit breaker and reconnect retry still apply
+    def register_query(self, name, sql, nparams):
+        name = 'q_' + name
+        if not name.isidentifier() or keyword.iskeyword(name):
+            raise ValueError("invalid query name: %s" % name)
+        args = ['p%d' % i for i in range(nparams)]
+        src = _QUERY_TEMPLATE % {
+            'name': name,
+            'sig': ''.join(', ' + p for p in args),
+            'params': '(%s)' % ''.join(p + ', ' for p in args) if args else 'None',
+        }
+        namespace = {
+            'SQL': sql,
+            'time': time,
+            'MySQLdb': MySQLdb,
+        }
+        exec(compile(src, '<query %s>' % name, 'exec'), namespace)
+        method = types.MethodType(namespace[name], self)
+        setattr(self, name, method)
+        return method
+
+    # same rows as query_all but read through mysqlclient's _mysql layer:
+    # conn.query() + store_result().fetch_row(0) builds every row in one C call
+    # without a DB-API cursor. with the PyMySQL driver this is just query_all
+    def query_all_lowlevel(self, sql, params=None):
+        if not hasattr(MySQLdb, '_mysql'):
+            return self.query_all(sql, params)
+        self._check_breaker()
+        try:
+            # the pool wraps connections, the cursor still points at the raw one
+            conn = self._get_cursor().connection
+            query = sql.encode(conn.encoding)
+            if params is not None:
+                query = query % tuple(conn.literal(p) for p in params)
+            conn.query(query)
+            rows = conn.store_result().fetch_row(0)
+        except MySQLdb.Error as e:
+            rows = self._execute_slow((sql, params), {}, time.perf_counter(), e).fetchall()
+        self._breaker.success()
+        return rows
 
     def query_one(self, *a, **kw):
         rows = self.query_all(*a, **kw)
@@ -149,19 +521,124 @@ class DB(object):
         else:
             return None
 
+    # iterate over the rows of a query
+    #
+    # the default cursor has already buffered the whole result on the client,
+    # so without streaming this walks fetchall() and the cached cursor stays
+    # reusable. streaming=True reads through a server side cursor (SSCursor)
+    # in batches of `chunk` rows via fetchmany, so rows come over the wire as
+    # they are consumed and client memory stays flat. such a cursor holds the
+    # thread's connection until the last row is read: finish (or close) the
+    # iterator before running other queries on the same thread
+    def query_iter(self, *a, **kw):
+        chunk = kw.pop('chunk', 1000)
+        if not kw.pop('streaming', False):
+            for row in self.execute(*a, **kw).fetchall():
+                yield row
+            return
+
+        cursor = None
+        try:
+            # 用本线程自己的连接：再从池里借一条会在 POOL_MAXCONNECTIONS 满时永远等下去
+            conn = self.get_conn()
+            if conn is None:
+                raise MySQLdb.OperationalError(2003, "can't connect to database")
+            kw['cursor'] = conn.cursor(MySQLdb.cursors.SSCursor)
+            cursor = self.execute(*a, **kw)
+            # the generator owns the cursor from here on, other queries on this
+            # thread must not reuse it while rows are still being consumed
+            if cursor is getattr(self._local, "cursor", None):
+                self._local.cursor = None
+            while True:
+                rows = cursor.fetchmany(chunk)
+                if not rows:
+                    return
+                for row in rows:
+                    yield row
+        finally:
+            cursor and cursor.close()
+
     def query_column(self, *a, **kw):
-        rows = self.query_all(*a, **kw)
+        return [row[0] for row in self.execute(*a, **kw).fetchall()]
+
+    # column-major result: {column name: list of values}, transposed once
+    # so aggregations can work per column instead of walking every row
+    def query_columns(self, *a, **kw):
+        cursor = self.execute(*a, **kw)
+        rows = cursor.fetchall()
+        names = [d[0] for d in cursor.description or ()]
         if rows:
-            return [row[0] for row in rows]
+            return dict(zip(names, map(list, zip(*rows))))
+        return dict((name, []) for name in names)
+
+    # like query_columns but every column is a numpy array, NULLs give object arrays
+    def query_arrays(self, *a, **kw):
+        if np is None:
+            raise RuntimeError("query_arrays requires numpy")
+        cols = self.query_columns(*a, **kw)
+        return dict((name, np.asarray(col)) for name, col in cols.items())
+
+    def _in_transaction(self):
+        return getattr(self._local, "tx_depth", 0) > 0
+
+    # insert/update commit right away unless they run inside transaction()
+    def _autocommit(self):
+        if not self._in_transaction():
+            self.commit()
+
+    # SteadyDB transparently reconnects and replays a failed statement unless
+    # begin() was called, which would commit the tail of a transaction whose
+    # head died with the old connection. nothing is lost yet when begin itself
+    # fails, so that one is retried on a fresh connection
+    def _begin(self):
+        attempt = 0
+        while True:
+            conn = self.get_conn()
+            if conn is None:
+                raise MySQLdb.OperationalError(2003, "can't connect to database")
+            try:
+                conn.begin()
+                return
+            except _RECONNECT_ERRORS as e:
+                if attempt >= self.config.get('RETRY_MAX', 1) or not _connection_lost(e):
+                    raise
+                self._reconnect(attempt)
+                attempt += 1
+
+    # run several insert/update calls as one transaction:
+    #
+    #     with db.transaction():
+    #         for row in rows:
+    #             db.insert(sql, row)
+    #
+    # commits once when the outermost block exits and rolls back if it raises.
+    # errors are not swallowed inside the block, IntegrityError included
+    @contextlib.contextmanager
+    def transaction(self):
+        depth = getattr(self._local, "tx_depth", 0)
+        if depth == 0:
+            self._begin()
+        self._local.tx_depth = depth + 1
+        try:
+            yield self
+        except BaseException:
+            if depth == 0:
+                self.rollback()
+            raise
         else:
-            return []
+            conn = self._get_conn()
+            # commit errors propagate here, the work would be lost otherwise
+            if depth == 0 and conn:
+                conn.commit()
+        finally:
+            self._local.tx_depth = depth
 
     def commit(self):
         conn = self._get_conn()
         if conn:
             try:
                 conn.commit()
-            except (MySQLdb.OperationalError, MySQLdb.InterfaceError, MySQLdb.InternalError):
+            except _RECONNECT_ERRORS:
                 self._set_conn(None)
 
     def rollback(self):
@@ -169,7 +646,7 @@ class DB(object):
         if conn:
             try:
                 conn.rollback()
-            except (MySQLdb.OperationalError, MySQLdb.InterfaceError, MySQLdb.InternalError):
+            except _RECONNECT_ERRORS:
                 self._set_conn(None)
 
     def close(self):
@@ -181,5 +658,108 @@ class DB(object):
                 self._set_conn(None)
 
 
+# asyncio counterpart of DB for coroutine callers, backed by asyncmy or aiomysql.
+# a pool is bound to the event loop it was created on, so create one AsyncDB per loop
+class AsyncDB(object):
+    def __init__(self, cfg):
+        if aiodriver is None:
+            raise RuntimeError("AsyncDB requires asyncmy or aiomysql")
+        self.config = cfg
+        self._pool = None
+        self._pool_lock = None
+
+    async def _get_pool(self):
+        if self._pool is None:
+            if self._pool_lock is None:
+                self._pool_lock = asyncio.Lock()
+            async with self._pool_lock:
+                if self._pool is None:
+                    cfg = self.config
+                    self._pool = await aiodriver.create_pool(
+                            minsize=cfg.get('POOL_MINCACHED', 2),
+                            maxsize=cfg.get('POOL_MAXCONNECTIONS') or cfg.get('POOL_MAXCACHED', 10),
+                            host=cfg['DB_HOST'],
+                            port=cfg['DB_PORT'],
+                            user=cfg['DB_USER'],
+                            password=cfg['DB_PASS'],
+                            db=cfg['DB_NAME'],
+                            charset="utf8",
+                            # the pools drop connections released inside an open
+                            # transaction, so every statement commits on its own
+                            autocommit=True)
+        return self._pool
+
+    # run the statement on a pooled connection and hand the cursor to `handle`,
+    # the connection goes back to the pool before the result is returned
+    async def execute(self, sql, params=None, handle=None):
+        errors = (aiodriver.OperationalError, aiodriver.InterfaceError, aiodriver.InternalError)
+        attempt = 0
+        while True:
+            # creating the pool and acquiring a connection can fail to connect
+            # too, they get the same log line and retry as the statement
+            try:
+                pool = await self._get_pool()
+                async with pool.acquire() as conn:
+                    try:
+                        async with conn.cursor() as cursor:
+                            await cursor.execute(sql, params)
+                            return await handle(cursor, conn) if handle else None
+                    except errors:
+                        # a closed connection is dropped by the pool on release
+                        conn.close()
+                        raise
+            except errors as e:
+                logger.error(
+                    "[DB_RECONNECT] sql=%s attempt=%d error=%s",
+                    _preview((sql,)), attempt, str(e)
+                )
+                if attempt >= self.config.get('RETRY_MAX', 1):
+                    raise
+            await asyncio.sleep(_backoff(attempt))
+            attempt += 1
+
+    # insert one record
+    # return last id
+    async def insert(self, sql, params=None):
+        async def handle(cursor, conn):
+            return cursor.lastrowid
+        try:
+            return await self.execute(sql, params, handle)
+        except aiodriver.IntegrityError:
+            return None
+
+    # update
+    # return affected row count
+    async def update(self, sql, params=None):
+        async def handle(cursor, conn):
+            return cursor.rowcount
+        try:
+            return await self.execute(sql, params, handle)
+        except aiodriver.IntegrityError:
+            return None
+
+    async def query_all(self, sql, params=None):
+        async def handle(cursor, conn):
+            return await cursor.fetchall()
+        return await self.execute(sql, params, handle)
+
+    async def query_one(self, sql, params=None):
+        rows = await self.query_all(sql, params)
+        if rows:
+            return rows[0]
+        else:
+            return None
+
+    async def query_column(self, sql, params=None):
+        rows = await self.query_all(sql, params)
+        return [row[0] for row in rows]
+
+    async def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            await self._pool.wait_closed()
+            self._pool = None
+
+
 db = DB(portal_db_cfg)
 alarm_db = DB(alarm_db_cfg)
@@ -16,8 +16,40 @@
 
 from rrd import config
 import logging
+import logging.handlers
+import threading
+import time
 logging.basicConfig(
         format='%(asctime)s %(levelname)s:%(message)s',
         datefmt="%Y-%m-%d %H:%M:%S",
         level=config.LOG_LEVEL)
 
+
+def _flush_periodically(handlers, interval):
+    while True:
+        time.sleep(interval)
+        for handler in handlers:
+            handler.flush()
+
+
+# batch WARNING-level records; ERROR and above flush the buffer immediately,
+# everything else at least every LOG_BUFFER_FLUSH_INTERVAL seconds so a quiet
+# worker does not sit on its last lines. opt-in: records still in the buffer
+# are lost when gunicorn kills a hung worker
+if config.LOG_BUFFER_CAPACITY > 0:
+    _root = logging.getLogger()
+    _buffers = []
+    for _handler in list(_root.handlers):
+        if isinstance(_handler, logging.handlers.MemoryHandler):
+            continue
+        _root.removeHandler(_handler)
+        _buffers.append(logging.handlers.MemoryHandler(
+                config.LOG_BUFFER_CAPACITY,
+                flushLevel=logging.ERROR,
+                target=_handler))
+        _root.addHandler(_buffers[-1])
+    threading.Thread(
+            target=_flush_periodically,
+            args=(_buffers, config.LOG_BUFFER_FLUSH_INTERVAL),
+            name='log-flush',
+            daemon=True).start()
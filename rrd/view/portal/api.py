@@ -137,7 +137,7 @@ def api_metric_query():
 # 给ping监控提供的接口
 @app.route('/api/pings')
 def api_pings_get():
-    names = db.query_column("select hostname from host")
+    names = [row[0] for row in db.query_all("select hostname from host", coalesce=True)]
     return jsonify(hosts=names)
 
 
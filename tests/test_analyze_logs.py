@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+日志分析工具回归测试：重写后的 logs/analyze_logs.py 与重写前的基线版本
+（tests/analyze_logs_baseline.py）对同一份日志必须输出逐字节相同的报告
+"""
+
+import os
+import random
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ANALYZER = os.path.join(ROOT, 'logs', 'analyze_logs.py')
+BASELINE = os.path.join(ROOT, 'tests', 'analyze_logs_baseline.py')
+
+# 不带时间戳、字段缺失、未配对的 id 等边界行
+EDGE_LINES = [
+    "[REQ_START] id=2 method=GET url=http://u/2 caller=a.py:1:f thread=T active_count=9",
+    "2026-10-15 03:00:01 WARNING:[REQ_START] id=bad method=GET",
+    "2026-10-15 03:00:02 ERROR:[REQ_TIMEOUT] id=7 method=GET url=http://u/7 elapsed=10.001s caller=a thread=b error=c",
+    "2026-10-15 03:00:03 WARNING:[HTTP_END] request_id=99 method=GET path=/a status=200 elapsed=3.100s",
+    "2026-10-15 03:00:03 WARNING:[REQ_END] id=424242 elapsed=1.000s active_count=2",
+    "2026-10-15 03:00:04 WARNING:noise [REQ_END] later on the line id=1 elapsed=9.9s active_count=1",
+    "2026-10-15 3:00:04 WARNING:[HTTP_START] request_id=5 method=GET path=/bad-ts remote_addr=x",
+]
+
+
+def _generate_log(path, requests=3000):
+    rnd = random.Random(1)
+    urls = ["http://127.0.0.1:31132/api/v1/user/%d" % i for i in range(40)]
+    callers = ["view/user/user.py:%d:f%d" % (i, i) for i in range(8)]
+    out = list(EDGE_LINES)
+    rid = 0
+    for s in range(requests):
+        ts = "2026-10-15 03:%02d:%02d" % ((s // 60) % 60, s % 60)
+        # 4 个 gunicorn worker 的请求ID：计数器各自从 1 开始，靠 pid 前缀区分
+        hid = "%d-%d" % (4000 + s % 4, s // 4 + 1)
+        out.append("%s WARNING:[HTTP_START] request_id=%s method=GET path=/p/%d remote_addr=1.1.1.1" % (ts, hid, s % 97))
+        for k in range(2):
+            rid += 1
+            url = rnd.choice(urls)
+            caller = rnd.choice(callers)
+            out.append("%s WARNING:[REQ_START] id=%d method=GET url=%s caller=%s thread=Thread-%d active_count=%d"
+                       % (ts, rid, url, caller, k, rnd.randint(0, 7)))
+            out.append("%s WARNING:some other noise line with 中文 and [brackets]" % ts)
+            elapsed = rnd.random() * 3
+            if rnd.random() < 0.01:
+                out.append("%s ERROR:[REQ_TIMEOUT] id=%d method=GET url=%s elapsed=%.3fs caller=%s thread=x error=y"
+                           % (ts, rid, url, 10.0 + elapsed, caller))
+            else:
+                out.append("%s WARNING:[REQ_SUCCESS] id=%d method=GET url=%s status=200 elapsed=%.3fs" % (ts, rid, url, elapsed))
+                if elapsed > 2:
+                    out.append("%s ERROR:[REQ_SLOW] id=%d method=GET url=%s elapsed=%.3fs caller=%s" % (ts, rid, url, elapsed, caller))
+            out.append("%s WARNING:[REQ_END] id=%d elapsed=%.3fs active_count=%d" % (ts, rid, elapsed, rnd.randint(0, 5)))
+        out.append("[DB_SLOW] no timestamp line")
+        out.append("%s WARNING:[HTTP_END] request_id=%s method=GET path=/p/%d status=200 elapsed=%.3fs"
+                   % (ts, hid, s % 97, rnd.random() * 6))
+    # 最后一行不带换行符，覆盖分块读取的尾部处理
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(out))
+
+
+def _run(args, stdin=None, prelude=''):
+    code = prelude + "import runpy, sys; sys.argv = %r; runpy.run_path(sys.argv[0], run_name='__main__')" % (args,)
+    with open(stdin, 'rb') if stdin else open(os.devnull, 'rb') as f:
+        proc = subprocess.run([sys.executable, '-c', code], stdin=f, cwd=ROOT,
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=300)
+    assert proc.returncode == 0, proc.stderr.decode('utf-8', 'replace')
+    return proc.stdout
+
+
+@pytest.fixture(scope='module')
+def log_and_baseline(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('logs') / 'dashboard.log')
+    _generate_log(path)
+    return path, _run([BASELINE, path])
+
+
+def test_report_matches_baseline(log_and_baseline):
+    path, expected = log_and_baseline
+    assert _run([ANALYZER, path]) == expected
+
+
+def test_report_matches_baseline_from_stdin(log_and_baseline):
+    path, expected = log_and_baseline
+    assert _run([ANALYZER, '-'], stdin=path) == expected
+
+
+def test_report_matches_baseline_without_numpy(log_and_baseline):
+    path, expected = log_and_baseline
+    assert _run([ANALYZER, path], prelude="import sys; sys.modules['numpy'] = None; ") == expected
+
+
+@pytest.mark.parametrize('scanner', ['ahocorasick', 'hyperscan'])
+def test_report_matches_baseline_with_optional_scanner(log_and_baseline, scanner):
+    pytest.importorskip(scanner)
+    path, expected = log_and_baseline
+    assert _run([ANALYZER, '--scanner', scanner, path]) == expected
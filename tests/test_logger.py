@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+日志缓冲测试：被强杀的 worker 不能丢掉卡死前的最后几行日志
+"""
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HANG_SCRIPT = """
+import os, time
+from rrd.utils.logger import logging
+logging.warning('[HTTP_START] request_id=1 method=GET path=/hang')
+time.sleep(%s)
+os._exit(0)
+"""
+
+
+def _stderr_of(delay, **env):
+    full_env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT] + sys.path))
+    full_env.pop('LOG_BUFFER_CAPACITY', None)
+    full_env.update(env)
+    proc = subprocess.run([sys.executable, '-c', HANG_SCRIPT % delay], cwd=ROOT, env=full_env,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60)
+    return proc.stderr.decode('utf-8', 'replace')
+
+
+def test_default_writes_through_before_hard_exit():
+    """默认不缓冲：os._exit 之前的 WARNING 必须已经写出"""
+    assert '[HTTP_START] request_id=1' in _stderr_of(0)
+
+
+def test_buffered_lines_are_flushed_periodically():
+    """开启缓冲后，安静的 worker 也会在刷新间隔内写出日志"""
+    stderr = _stderr_of(0.5, LOG_BUFFER_CAPACITY='1000', LOG_BUFFER_FLUSH_INTERVAL='0.05')
+    assert '[HTTP_START] request_id=1' in stderr
@@ -0,0 +1,700 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+rrd.store.DB 测试：真实的 DB 类 + 真实的 DBUtils PooledDB，底下换成一个假的 DB-API 驱动
+
+假驱动的每条连接记录自己执行过的写操作，只有 commit 之后才进入 driver.committed，
+这样可以直接检查“断线重连 / 事务 / 连接池”之后到底提交了什么
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rrd import store
+
+MySQLdb = store.MySQLdb
+
+
+# ============================================================================
+# 假的 DB-API 驱动
+# ============================================================================
+
+class FakeCursor(object):
+    def __init__(self, conn):
+        self.connection = conn
+        self.description = None
+        self.rowcount = -1
+        self.lastrowid = None
+        self._rows = ()
+
+    def execute(self, sql, params=None):
+        conn = self.connection
+        conn.check()
+        driver = conn.driver
+        if driver.statement_hook:
+            driver.statement_hook(conn, sql, params)
+        params = tuple(params) if params is not None else ()
+        verb = sql.split()[0]
+        self.description = None
+        self._rows = ()
+        if verb == 'insert':
+            if params and params[0] == 'dup':
+                raise MySQLdb.IntegrityError(1062, "Duplicate entry 'dup'")
+            conn.pending.append(('insert', conn.id, sql, params))
+            with driver.lock:
+                driver.last_id += 1
+                self.lastrowid = driver.last_id
+            self.rowcount = 1
+        elif verb == 'update':
+            value, key = params
+            conn.pending.append(('update', conn.id, key, value))
+            self.rowcount = 1
+        elif verb == 'delete':
+            conn.pending.append(('delete', conn.id, sql, params))
+            self.rowcount = 1
+        elif sql == 'select v from t where k = %s':
+            if driver.select_hook:
+                driver.select_hook(conn)
+            self.description = (('v',),)
+            self._rows = ((driver.values.get(params[0]),),)
+            self.rowcount = 1
+        elif sql == 'select bad_col from t':
+            raise MySQLdb.OperationalError(1054, "Unknown column 'bad_col' in 'field list'")
+        elif sql == 'select n from numbers':
+            self.description = (('n',),)
+            self._rows = tuple((i,) for i in range(driver.numbers))
+            self.rowcount = len(self._rows)
+        else:
+            raise MySQLdb.ProgrammingError(1064, 'You have an error in your SQL syntax')
+
+    def executemany(self, sql, seq_of_params):
+        count = 0
+        for params in seq_of_params:
+            self.execute(sql, params)
+            count += 1
+        self.rowcount = count
+
+    def fetchall(self):
+        rows, self._rows = self._rows, ()
+        return rows
+
+    def fetchmany(self, size):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def close(self):
+        self.connection = None
+
+
+class FakeResult(object):
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetch_row(self, maxrows=1):
+        return self.rows if maxrows == 0 else self.rows[:maxrows]
+
+
+class FakeConnection(object):
+    # mysqlclient 的 _mysql 接口：literal / query / store_result
+    encoding = 'utf8'
+
+    def __init__(self, driver, conn_id):
+        self.driver = driver
+        self.id = conn_id
+        self.pending = []
+        self.alive = True
+        self.closed = False
+
+    def check(self):
+        if not self.alive or self.driver.down:
+            raise MySQLdb.OperationalError(2006, 'MySQL server has gone away')
+
+    def cursor(self, cursorclass=None):
+        self.check()
+        with self.driver.lock:
+            self.driver.cursors += 1
+        return FakeCursor(self)
+
+    def begin(self):
+        self.check()
+        self.commit()
+
+    def commit(self):
+        self.check()
+        with self.driver.lock:
+            for op in self.pending:
+                if op[0] == 'update':
+                    self.driver.values[op[2]] = op[3]
+                else:
+                    self.driver.committed.append((op[1], op[2], op[3]))
+        self.pending = []
+
+    def rollback(self):
+        self.check()
+        self.pending = []
+
+    def ping(self, *args):
+        self.check()
+        return True
+
+    def literal(self, value):
+        return ("'%s'" % str(value).replace('\\', '\\\\').replace("'", "\\'")).encode(self.encoding)
+
+    def query(self, query):
+        """只认 FakeCursor 里那条带参数的 select，参数按 literal 的规则还原"""
+        self.check()
+        self.driver.raw_queries.append(query)
+        sql, sep, literal = query.decode(self.encoding).partition(' = ')
+        key = literal[1:-1].replace("\\'", "'").replace('\\\\', '\\')
+        cursor = FakeCursor(self)
+        cursor.execute(sql + sep + '%s' if sep else sql, [key] if sep else None)
+        self._result = cursor.fetchall()
+
+    def store_result(self):
+        return FakeResult(self._result)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeDriver(object):
+    threadsafety = 1
+    Error = MySQLdb.Error
+    OperationalError = MySQLdb.OperationalError
+    InterfaceError = MySQLdb.InterfaceError
+    InternalError = MySQLdb.InternalError
+    ProgrammingError = MySQLdb.ProgrammingError
+    IntegrityError = MySQLdb.IntegrityError
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = []
+        self.committed = []
+        self.values = {}
+        self.numbers = 0
+        self.cursors = 0
+        self.last_id = 0
+        self.select_hook = None
+        self.statement_hook = None
+        self.selects = 0
+        self.raw_queries = []
+        self.down = False
+
+    def connect(self, **kwargs):
+        if self.down:
+            raise MySQLdb.OperationalError(2003, "Can't connect to MySQL server")
+        with self.lock:
+            conn = FakeConnection(self, len(self.connections) + 1)
+            self.connections.append(conn)
+        return conn
+
+    def open_connections(self):
+        return sum(1 for conn in self.connections if not conn.closed)
+
+
+def make_db(driver, **cfg):
+    conf = {
+        "DB_HOST": 'fake',
+        "DB_PORT": 3306,
+        "DB_USER": 'user',
+        "DB_PASS": 'pass',
+        "DB_NAME": 'falcon',
+        "POOL_MINCACHED": 0,
+        "POOL_MAXCACHED": 5,
+        "RETRY_MAX": 1,
+    }
+    conf.update(cfg)
+    db = store.DB(conf)
+    db._pool = store.create_pool(conf, creator=driver)
+    return db
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(store, 'RETRY_BACKOFF_BASE', 0.001)
+    monkeypatch.setattr(store, 'RETRY_BACKOFF_CAP', 0.001)
+
+
+@pytest.fixture
+def driver():
+    return FakeDriver()
+
+
+# ============================================================================
+# insert_many / update_many
+# ============================================================================
+
+def test_insert_many_commits_once(driver):
+    """所有分块一起提交，只有一次 commit"""
+    db = make_db(driver)
+    rows = [(i,) for i in range(5)]
+    assert db.insert_many('insert into t values(%s)', rows, chunk=2) is not None
+    assert [params for _, _, params in driver.committed] == rows
+
+
+def test_insert_many_integrity_error_writes_nothing(driver):
+    """第二个分块主键冲突：之前的分块也不能留在库里"""
+    db = make_db(driver)
+    rows = [(1,), (2,), ('dup',), (4,)]
+    assert db.insert_many('insert into t values(%s)', rows, chunk=2) is None
+    assert driver.committed == []
+
+
+def test_insert_many_integrity_error_raises_inside_transaction(driver):
+    db = make_db(driver)
+    with pytest.raises(MySQLdb.IntegrityError):
+        with db.transaction():
+            db.insert_many('insert into t values(%s)', [(1,), ('dup',)])
+    assert driver.committed == []
+
+
+# ============================================================================
+# 事务
+# ============================================================================
+
+def _kill_connection_after(monkeypatch, count):
+    """执行完 count 条语句之后，当前连接断开（模拟 MySQL server has gone away）"""
+    execute = FakeCursor.execute
+    executed = []
+
+    def fake_execute(cursor, sql, params=None):
+        if len(executed) == count:
+            cursor.connection.alive = False
+        executed.append(sql)
+        return execute(cursor, sql, params)
+    monkeypatch.setattr(FakeCursor, 'execute', fake_execute)
+
+
+def test_transaction_is_not_half_committed_after_a_dropped_connection(driver, monkeypatch):
+    """事务中途断线：后半段不能在新连接上重放并提交"""
+    db = make_db(driver)
+    _kill_connection_after(monkeypatch, 1)
+    with pytest.raises(MySQLdb.OperationalError):
+        with db.transaction():
+            db.execute('insert into t values(%s)', ['A'])
+            db.execute('insert into t values(%s)', ['B'])
+    db.commit()
+    assert driver.committed == []
+
+
+def test_transaction_begin_reconnects_a_dropped_connection(driver):
+    """begin 之前连接就断了：什么都还没丢，换一条连接继续"""
+    db = make_db(driver)
+    db.query_all('select v from t where k = %s', ['a'])
+    driver.connections[0].alive = False
+    with db.transaction():
+        db.execute('insert into t values(%s)', ['A'])
+    assert [params for _, _, params in driver.committed] == [('A',)]
+
+
+def test_delete_group_is_all_or_nothing(driver, monkeypatch):
+    from rrd.service import group_service
+    db = make_db(driver)
+    monkeypatch.setattr(group_service, 'db', db)
+    _kill_connection_after(monkeypatch, 2)
+    assert group_service.delete_group(7) == 'delete group 7 fail'
+    db.commit()
+    assert driver.committed == []
+
+
+# ============================================================================
+# 重连重试
+# ============================================================================
+
+def test_retry_gives_up_after_retry_max(driver, caplog):
+    """连接一直断：重试 RETRY_MAX 次之后把最后一次的错误抛出去"""
+    db = make_db(driver, RETRY_MAX=3)
+    errors = []
+
+    def hook(conn, sql, params):
+        errors.append(MySQLdb.OperationalError(2013, 'Lost connection to MySQL server #%d' % len(errors)))
+        raise errors[-1]
+    driver.statement_hook = hook
+    with pytest.raises(MySQLdb.OperationalError) as e:
+        db.query_all('select n from numbers')
+    reconnects = [r.getMessage() for r in caplog.records if '[DB_RECONNECT]' in r.getMessage()]
+    assert len(reconnects) == 4
+    assert e.value is not errors[0]
+    assert reconnects[-1].endswith('error=%s' % e.value)
+
+
+def test_retry_recovers_on_a_new_connection(driver, caplog):
+    driver.numbers = 1
+    db = make_db(driver, RETRY_MAX=3)
+
+    def hook(conn, sql, params):
+        if conn.id < 4:
+            raise MySQLdb.OperationalError(2006, 'MySQL server has gone away')
+    driver.statement_hook = hook
+    assert db.query_all('select n from numbers') == ((0,),)
+    assert 0 < caplog.text.count('[DB_RECONNECT]') <= 3
+
+
+def _insert(db):
+    return db.execute('insert into t values(%s)', [1])
+
+
+def _insert_many(db):
+    return db.executemany('insert into t values(%s)', [(1,), (2,)])
+
+
+@pytest.mark.parametrize('call', [_insert, _insert_many])
+@pytest.mark.parametrize('errno', [1054, 1205, 1213])
+def test_server_errors_are_not_retried(driver, caplog, call, errno):
+    """1054 未知列 / 1205 锁等待超时 / 1213 死锁：库是好的，不重连也不重放写操作"""
+    db = make_db(driver, RETRY_MAX=3)
+    calls = []
+
+    def hook(conn, sql, params):
+        calls.append(sql)
+        raise MySQLdb.OperationalError(errno, 'server said no')
+    driver.statement_hook = hook
+    with pytest.raises(MySQLdb.OperationalError) as e:
+        call(db)
+    assert e.value.args[0] == errno
+    assert len(calls) == 1
+    assert len(driver.connections) == 1
+    assert '[DB_RECONNECT]' not in caplog.text
+
+
+# ============================================================================
+# 连接池
+# ============================================================================
+
+def _in_thread(fn, timeout=5):
+    """在新线程里执行 fn，返回 (是否按时结束, 结果或异常)"""
+    result = []
+
+    def run():
+        try:
+            result.append(fn())
+        except Exception as e:
+            result.append(e)
+
+    t = threading.Thread(target=run, daemon=True)
+    t.start()
+    t.join(timeout)
+    return not t.is_alive(), result[0] if result else None
+
+
+def _request(db, fn):
+    """模拟一次 web 请求：执行查询，然后像 app_teardown 一样提交并归还连接"""
+    def run():
+        try:
+            return fn()
+        finally:
+            db.commit()
+            db.close()
+    return run
+
+
+def test_close_returns_connection_to_pool(driver):
+    db = make_db(driver)
+    for _ in range(3):
+        finished, _ = _in_thread(_request(db, lambda: db.query_all('select v from t where k = %s', ['a'])))
+        assert finished
+    assert len(driver.connections) == 1
+
+
+def test_threads_wait_for_a_free_connection_under_the_cap(driver):
+    db = make_db(driver, POOL_MAXCACHED=1, POOL_MAXCONNECTIONS=1)
+    threads = [threading.Thread(target=_request(db, lambda: db.query_all('select v from t where k = %s', ['a'])))
+               for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    assert not any(t.is_alive() for t in threads)
+    assert len(driver.connections) == 1
+
+
+def test_execute_async_returns_its_connection(driver):
+    """execute_async 的工作线程用完就归还连接，不能一直占着连接池"""
+    driver.numbers = 2
+    db = make_db(driver, POOL_MAXCACHED=1, POOL_MAXCONNECTIONS=1)
+    assert db.execute_async('select n from numbers').result(5) == ((0,), (1,))
+    finished, rows = _in_thread(_request(db, lambda: db.query_all('select n from numbers')))
+    assert finished
+    assert rows == ((0,), (1,))
+
+
+# ============================================================================
+# 游标复用
+# ============================================================================
+
+def test_query_column_reuses_the_cached_cursor(driver):
+    """Bean.total 之类的 query_column 调用不能每次都丢掉缓存的游标"""
+    driver.numbers = 3
+    db = make_db(driver)
+    for _ in range(5):
+        assert db.query_column('select n from numbers') == [0, 1, 2]
+        assert db.query_all('select n from numbers') == ((0,), (1,), (2,))
+    assert list(db.query_iter('select n from numbers')) == [(0,), (1,), (2,)]
+    assert driver.cursors == 1
+
+
+def test_streaming_uses_the_threads_own_connection(driver):
+    """连接数上限为 1 时，已经持有连接的线程做流式查询不能卡死"""
+    driver.numbers = 5
+    db = make_db(driver, POOL_MAXCACHED=1, POOL_MAXCONNECTIONS=1)
+
+    def run():
+        db.query_all('select v from t where k = %s', ['a'])
+        return list(db.query_iter('select n from numbers', streaming=True, chunk=2))
+
+    finished, rows = _in_thread(_request(db, run))
+    assert finished
+    assert rows == [(0,), (1,), (2,), (3,), (4,)]
+    assert len(driver.connections) == 1
+
+
+# ============================================================================
+# 读合并
+# ============================================================================
+
+def _block_first_select(driver):
+    """第一条 select 卡住，直到 release 被设置"""
+    started, release = threading.Event(), threading.Event()
+
+    def hook(conn):
+        with driver.lock:
+            driver.selects += 1
+        if not started.is_set():
+            started.set()
+            release.wait(5)
+    driver.select_hook = hook
+    return started, release
+
+
+def test_query_all_does_not_share_reads_by_default(driver):
+    """刚写完的线程再读，不能拿到别的线程在写之前开始的那次查询结果"""
+    driver.values['a'] = 'old'
+    db = make_db(driver)
+    sql = 'select v from t where k = %s'
+    started, release = _block_first_select(driver)
+    reader = threading.Thread(target=_request(db, lambda: db.query_all(sql, ['a'])))
+    reader.start()
+    assert started.wait(5)
+
+    def write_then_read():
+        db.update('update t set v = %s where k = %s', ['new', 'a'])
+        return db.query_all(sql, ['a'])
+    finished, rows = _in_thread(_request(db, write_then_read), timeout=1)
+    release.set()
+    reader.join(5)
+    assert finished
+    assert rows == (('new',),)
+
+
+def test_query_all_coalesce_shares_one_execution(driver):
+    driver.values['a'] = 'v'
+    db = make_db(driver)
+    sql = 'select v from t where k = %s'
+    started, release = _block_first_select(driver)
+    results = []
+    threads = [threading.Thread(target=_request(db, lambda: results.append(db.query_all(sql, ['a'], coalesce=True))))
+               for _ in range(3)]
+    threads[0].start()
+    assert started.wait(5)
+    for t in threads[1:]:
+        t.start()
+    time.sleep(0.2)
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert results == [(('v',),)] * 3
+    assert driver.selects == 1
+
+
+# ============================================================================
+# query_all_lowlevel（mysqlclient 的 _mysql 路径）
+# ============================================================================
+
+@pytest.fixture
+def mysqlclient(monkeypatch):
+    """让 query_all_lowlevel 以为装的是 mysqlclient，走 conn.query + store_result"""
+    monkeypatch.setattr(MySQLdb, '_mysql', object(), raising=False)
+
+
+def test_query_all_lowlevel_escapes_params(driver, mysqlclient):
+    key = "it's a \\ key"
+    driver.values[key] = 'x'
+    db = make_db(driver)
+    sql = 'select v from t where k = %s'
+    assert db.query_all_lowlevel(sql, [key]) == db.query_all(sql, [key]) == (('x',),)
+    assert driver.raw_queries == [b"select v from t where k = 'it\\'s a \\\\ key'"]
+
+
+def test_query_all_lowlevel_without_params(driver, mysqlclient):
+    driver.numbers = 3
+    db = make_db(driver)
+    assert db.query_all_lowlevel('select n from numbers') == db.query_all('select n from numbers')
+    assert driver.raw_queries == [b'select n from numbers']
+
+
+def test_query_all_lowlevel_reconnects_through_execute_slow(driver, mysqlclient, caplog):
+    driver.values['a'] = 'x'
+    db = make_db(driver)
+    db.query_all('select n from numbers')
+    driver.connections[0].alive = False
+    assert db.query_all_lowlevel('select v from t where k = %s', ['a']) == (('x',),)
+    assert '[DB_RECONNECT]' in caplog.text
+    # 断开的连接上 query 没发出去，重试走的是 _execute_slow 里的 DB-API 游标
+    assert driver.raw_queries == []
+
+
+# ============================================================================
+# 熔断
+# ============================================================================
+
+def _bad_execute(db):
+    db.query_all('select bad')
+
+
+def _bad_executemany(db):
+    db.executemany('insert into t values(%s)', [('dup',)])
+
+
+def _bad_registered_query(db):
+    db.register_query('bad', 'select bad', 0)()
+
+
+def _unknown_column(db):
+    db.query_all('select bad_col from t')
+
+
+@pytest.mark.parametrize('probe', [_bad_execute, _bad_executemany, _bad_registered_query, _unknown_column])
+def test_breaker_closes_when_the_probe_fails_with_a_statement_error(driver, probe):
+    """半开探测遇到 SQL 错误也说明库是通的，熔断必须关上，而不是再挂一个冷却期"""
+    db = make_db(driver, BREAKER_THRESHOLD=1, BREAKER_COOLDOWN=0.05, RETRY_MAX=0)
+    driver.down = True
+    with pytest.raises(MySQLdb.OperationalError):
+        db.query_all('select v from t where k = %s', ['a'])
+    with pytest.raises(store.CircuitOpenError):
+        db.query_all('select v from t where k = %s', ['a'])
+
+    driver.down = False
+    time.sleep(0.06)
+    with pytest.raises(MySQLdb.Error) as e:
+        probe(db)
+    assert not isinstance(e.value, store.CircuitOpenError)
+    assert db._breaker.state == 'closed'
+    assert db.query_all('select v from t where k = %s', ['a']) == ((None,),)
+
+
+def test_server_side_operational_errors_do_not_trip_the_breaker(driver):
+    """1054 也是 OperationalError，但库是好的：熔断不能打开，也不能重连"""
+    db = make_db(driver, BREAKER_THRESHOLD=5, RETRY_MAX=3)
+    for _ in range(10):
+        with pytest.raises(MySQLdb.OperationalError) as e:
+            db.query_all('select bad_col from t')
+        assert e.value.args[0] == 1054
+    assert db._breaker.state == 'closed'
+    assert db._breaker.failures == 0
+    assert len(driver.connections) == 1
+    assert db.query_all('select v from t where k = %s', ['a']) == ((None,),)
+
+
+def test_deadlock_in_a_transaction_is_not_a_breaker_failure(driver):
+    db = make_db(driver, BREAKER_THRESHOLD=1)
+
+    def hook(conn, sql, params):
+        if sql.startswith('update'):
+            raise MySQLdb.OperationalError(1213, 'Deadlock found when trying to get lock')
+    driver.statement_hook = hook
+    with pytest.raises(MySQLdb.OperationalError):
+        with db.transaction():
+            db.update('update t set v = %s where k = %s', ['x', 'a'])
+    assert db._breaker.state == 'closed'
+    assert db._breaker.failures == 0
+
+
+# ============================================================================
+# AsyncDB
+# ============================================================================
+
+class FakeAsyncCursor(object):
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, sql, params=None):
+        pass
+
+    async def fetchall(self):
+        return self.rows
+
+
+class FakeAsyncConnection(object):
+    def __init__(self, rows):
+        self.rows = rows
+        self.closed = False
+
+    def cursor(self):
+        return FakeAsyncCursor(self.rows)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeAsyncPool(object):
+    """前 fail 次 acquire 连不上库"""
+
+    def __init__(self, fail, rows):
+        self.fail = fail
+        self.rows = rows
+        self.acquired = 0
+
+    def acquire(self):
+        pool = self
+
+        class Acquire(object):
+            async def __aenter__(self):
+                pool.acquired += 1
+                if pool.fail:
+                    pool.fail -= 1
+                    raise store.aiodriver.OperationalError(2003, "Can't connect to MySQL server")
+                return FakeAsyncConnection(pool.rows)
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return Acquire()
+
+
+def _async_db(pool, **cfg):
+    conf = {"RETRY_MAX": 1}
+    conf.update(cfg)
+    db = store.AsyncDB(conf)
+    db._pool = pool
+    return db
+
+
+@pytest.mark.skipif(store.aiodriver is None, reason='asyncmy / aiomysql not installed')
+def test_async_acquire_failure_is_retried(caplog):
+    pool = FakeAsyncPool(fail=1, rows=((1,),))
+    db = _async_db(pool)
+    assert asyncio.run(db.query_all('select 1')) == ((1,),)
+    assert pool.acquired == 2
+    assert '[DB_RECONNECT]' in caplog.text
+
+
+@pytest.mark.skipif(store.aiodriver is None, reason='asyncmy / aiomysql not installed')
+def test_async_acquire_failure_raises_after_retry_max():
+    pool = FakeAsyncPool(fail=5, rows=())
+    db = _async_db(pool, RETRY_MAX=2)
+    with pytest.raises(store.aiodriver.OperationalError):
+        asyncio.run(db.query_all('select 1'))
+    assert pool.acquired == 3
@@ -58,8 +58,8 @@ if has_except_exception:
 else:
     print('✓ execute() 中没有 except Exception')
 
-# 检查必要的代码
-if 'except (AttributeError' not in execute_code:
+# 检查必要的代码：数据库错误统一交给 _execute_slow 判断是否重连
+if 'except MySQLdb.Error as e' not in execute_code or '_execute_slow(' not in execute_code:
     print('❌ FAIL: 缺少 OperationalError 处理')
     sys.exit(1)
 else: